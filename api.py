@@ -1,11 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import aiohttp
+import asyncio
 import tempfile
 import os
-from pdf_reader import process_pdf
+import secrets
+from multipart.multipart import MultipartParser, parse_options_header
+from multipart.exceptions import MultipartParseError
+from pdf_reader import process_pdf, preload_backends, diff_rosters, classify_pdf, DIAGNOSTICS_LEVELS, JobBudget, MAX_JOB_RSS_MB
+from scheduler import LANES, LaneBusyError, LaneTimeoutError, collect_metrics, publish_metrics
+from profiling import SamplingProfiler
 import logging
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, List, Optional, Literal, Union
 
 # Loglama ayarları
 logging.basicConfig(level=logging.INFO)
@@ -14,66 +22,411 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="E-Okul PDF Okuyucu API",
     description="E-Okul'dan alınan PDF formatındaki öğrenci listelerini JSON formatına dönüştürür",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Büyük okul çıktıları için sıkıştırma
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1024")))
+
+# Pre-fork işçiler için opsiyonel arka uçları önceden yükle
+# (örn. PDF_PRELOAD_BACKENDS=all veya PDF_PRELOAD_BACKENDS=fitz,pdfminer)
+_preload = os.getenv("PDF_PRELOAD_BACKENDS", "").strip()
+if _preload:
+    _names = None if _preload == "all" else [n.strip() for n in _preload.split(",") if n.strip()]
+    logger.info(f"Arka uçlar önceden yüklendi: {preload_backends(_names)}")
+
+# RSS süreç geneli ölçülür ve şeritler aynı süreçte eşzamanlı iş çalıştırır; iş başına
+# bellek sınırı API'de uygulanmaz, artış yalnızca tanılamada raporlanır
+if MAX_JOB_RSS_MB:
+    logger.warning("PDF_MAX_JOB_RSS_MB API'de uygulanmaz; RSS artışı yalnızca raporlanır")
+
+# Yükleme/indirme ayarları (nginx client_max_body_size ile uyumlu)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Dosya dışındaki form alanları ve multipart sınırları için pay
+UPLOAD_FIELD_MAX_BYTES = 1024
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# İstek bazında profil çıkarma; PROFILE_TOKEN tanımlı değilse kapalıdır
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+
+DiagnosticsLevel = Literal["none", "summary", "full"]
+
 class PDFRequest(BaseModel):
     pdf_url: str
+    diagnostics: DiagnosticsLevel = "full"
+    profile: bool = False
+
+class RosterStudent(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    studentId: str
+
+class RosterClass(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    classInfo: Dict[str, Any] = {}
+    students: List[RosterStudent] = []
+
+class RosterData(BaseModel):
+    """Önceki yanıtın data bloğu"""
+    model_config = ConfigDict(extra="allow")
+    classes: List[RosterClass]
+
+class RosterResponse(BaseModel):
+    """Önceki yanıtın tamamı"""
+    model_config = ConfigDict(extra="allow")
+    data: RosterData
+
+class FingerprintSet(BaseModel):
+    """Önceki yanıtın data["fingerprints"] kümesi"""
+    document: Optional[str] = None
+    classes: Dict[str, str]
+
+class PDFDiffRequest(PDFRequest):
+    # Biçim işlemeden önce doğrulanır; uymayan gövde 422 ile reddedilir
+    previous: Union[RosterData, FingerprintSet, RosterResponse]
 
 class APIResponse(BaseModel):
     status: bool
     message: str
     data: Optional[dict] = None
 
+def _check_profile_token(token: Optional[str]):
+    """profile=true istekleri için X-Profile-Token doğrulaması"""
+    if not PROFILE_TOKEN or not token or not secrets.compare_digest(token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Profil çıkarma için yetki yok")
+
+def _run_pdf_job(temp_path: str, source: Optional[str], diagnostics: str, lane: str, profile: bool = False) -> dict:
+    """Şerit havuzunda çalışır: PDF'i işler ve geçici dosyayı siler"""
+    budget = JobBudget(max_rss_mb=0)
+    try:
+        if not profile:
+            return process_pdf(temp_path, source, diagnostics=diagnostics, lane=lane, budget=budget)
+        with SamplingProfiler() as profiler:
+            result = process_pdf(temp_path, source, diagnostics=diagnostics, lane=lane, budget=budget)
+        profile_data = profiler.summary()
+        if PROFILE_DIR:
+            profile_data["path"] = profiler.save(PROFILE_DIR)
+        if result.get("data") is None:
+            result["data"] = {}
+        result["data"]["profile"] = profile_data
+        return result
+    finally:
+        # Geçici dosyayı sil
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+async def _process_temp_pdf(temp_path: str, source: Optional[str], diagnostics: str = "full", previous: Optional[dict] = None, profile: bool = False) -> APIResponse:
+    """Geçici PDF dosyasını uygun şeritte işler, yanıtı hazırlar ve dosyayı siler.
+    previous verilirse tam sınıf listesi yerine yalnızca değişiklikler döner."""
+    loop = asyncio.get_running_loop()
+    still_running = False
+    try:
+        # İlk sayfaya bakarak hızlı ya da OCR şeridini seç
+        lane = await loop.run_in_executor(None, classify_pdf, temp_path)
+        logger.info(f"PDF {lane} şeridine yönlendirildi: {source}")
+        result = await LANES[lane].run(_run_pdf_job, temp_path, source, diagnostics, lane, profile)
+    except LaneBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except LaneTimeoutError as e:
+        # Zaman aşımına uğrayan iş arka planda sürüyorsa dosyayı kendisi siler
+        still_running = e.started
+        raise HTTPException(status_code=504, detail=str(e))
+    finally:
+        # İş başlamadan çıkıldıysa geçici dosyayı burada sil
+        if not still_running and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+    if not result["success"]:
+        # Başarısızlıkta da tanılama verilerini döndür
+        return APIResponse(
+            status=False,
+            message=result.get("message", "İşleme hatası"),
+            data=result.get("data", {})
+        )
+
+    if previous is not None:
+        data = result["data"]
+        # Tam API yanıtı gönderildiyse data bloğunu kullan
+        if isinstance(previous.get("data"), dict):
+            previous = previous["data"]
+        diff_data = {
+            "totalPages": data["totalPages"],
+            "processedAt": data["processedAt"],
+            "schoolInfo": data["schoolInfo"],
+            "fingerprints": data["fingerprints"],
+            "diff": diff_rosters(previous, data["classes"]),
+            "errors": data.get("errors", [])
+        }
+        for key in ("diagnostics", "profile"):
+            if key in data:
+                diff_data[key] = data[key]
+        return APIResponse(
+            status=True,
+            message="PDF başarıyla işlendi",
+            data=diff_data
+        )
+
+    return APIResponse(
+        status=True,
+        message="PDF başarıyla işlendi",
+        data=result["data"]
+    )
+
+async def _download_pdf(pdf_url: str) -> str:
+    """PDF dosyasını geçici olarak indirir ve dosya yolunu döndürür"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(pdf_url) as response:
+            if response.status != 200:
+                raise HTTPException(status_code=400, detail="PDF dosyası indirilemedi")
+            
+            # Gövdeyi parça parça geçici dosyaya yaz; boyut sınırı aşılırsa iptal et
+            size = 0
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+                try:
+                    async for chunk in response.content.iter_chunked(UPLOAD_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_UPLOAD_BYTES:
+                            raise HTTPException(
+                                status_code=413,
+                                detail=f"PDF dosyası çok büyük (en fazla {MAX_UPLOAD_BYTES} bayt)"
+                            )
+                        temp_file.write(chunk)
+                except BaseException:
+                    temp_file.close()
+                    os.unlink(temp_file.name)
+                    raise
+                return temp_file.name
+
 @app.post("/process-pdf", response_model=APIResponse)
-async def process_pdf_url(request: PDFRequest):
+async def process_pdf_url(request: PDFRequest, x_profile_token: Optional[str] = Header(None)):
     """PDF URL'sini alıp işleyen endpoint"""
+    if request.profile:
+        _check_profile_token(x_profile_token)
     try:
         logger.info(f"PDF URL'si alındı: {request.pdf_url}")
         
         # PDF dosyasını geçici olarak indir
-        async with aiohttp.ClientSession() as session:
-            async with session.get(request.pdf_url) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=400, detail="PDF dosyası indirilemedi")
-                
-                # Geçici dosya oluştur
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                    temp_file.write(await response.read())
-                    temp_path = temp_file.name
+        temp_path = await _download_pdf(request.pdf_url)
         
         logger.info(f"PDF başarıyla indirildi: {temp_path}")
         
-        try:
-            # PDF'i işle
-            result = process_pdf(temp_path, request.pdf_url)
+        return await _process_temp_pdf(temp_path, request.pdf_url, request.diagnostics, profile=request.profile)
             
-            # Geçici dosyayı sil
-            os.unlink(temp_path)
-            
-            if not result["success"]:
-                # Başarısızlıkta da tanılama verilerini döndür
-                return APIResponse(
-                    status=False,
-                    message=result.get("message", "İşleme hatası"),
-                    data=result.get("data", {})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"PDF işlenirken hata: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/process-pdf/diff", response_model=APIResponse)
+async def process_pdf_diff(request: PDFDiffRequest, x_profile_token: Optional[str] = Header(None)):
+    """PDF'i işleyip önceki çıktıya göre yalnızca eklenen/çıkan/değişen öğrencileri döndürür"""
+    if request.profile:
+        _check_profile_token(x_profile_token)
+    try:
+        logger.info(f"PDF URL'si alındı (diff): {request.pdf_url}")
+
+        temp_path = await _download_pdf(request.pdf_url)
+
+        logger.info(f"PDF başarıyla indirildi: {temp_path}")
+
+        return await _process_temp_pdf(temp_path, request.pdf_url, request.diagnostics, previous=request.previous.model_dump(), profile=request.profile)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"PDF işlenirken hata: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class _UploadReceiver:
+    """multipart/form-data gövdesini akış halinde ayrıştırır. "file" alanı boyut
+    sınırı denetlenerek doğrudan geçici dosyaya yazılır, diğer alanlar bellekte tutulur."""
+
+    def __init__(self, boundary: bytes, temp_file):
+        self.temp_file = temp_file
+        self.size = 0
+        self.filename = None
+        self.has_file = False
+        self.finished = False
+        self.fields = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._name = None
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_end": self._on_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._name = None
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("latin-1")
+        if self._name == "file":
+            # İkinci bir dosya parçası ilkinin arkasına eklenmesin
+            if self.has_file:
+                raise HTTPException(status_code=400, detail="Birden fazla file alanı gönderildi")
+            self.has_file = True
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace") or None
+        else:
+            self.fields[self._name] = b""
+
+    def _on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        if self._name == "file":
+            self.size += len(chunk)
+            if self.size > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"PDF dosyası çok büyük (en fazla {MAX_UPLOAD_BYTES} bayt)"
                 )
-            
-            return APIResponse(
-                status=True,
-                message="PDF başarıyla işlendi",
-                data=result["data"]
+            self.temp_file.write(chunk)
+        elif self._name is not None:
+            value = self.fields[self._name] + chunk
+            if len(value) > UPLOAD_FIELD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form alanı çok büyük: {self._name}")
+            self.fields[self._name] = value
+
+    def _on_end(self):
+        self.finished = True
+
+    def field(self, name: str, default: str) -> str:
+        value = self.fields.get(name)
+        return value.decode("utf-8", "replace").strip() if value is not None else default
+
+def _parse_form_bool(value: str) -> bool:
+    """FastAPI'nin bool form alanı yorumuyla uyumlu dönüşüm"""
+    lowered = value.lower()
+    if lowered in ("1", "true", "on", "yes"):
+        return True
+    if lowered in ("0", "false", "off", "no", ""):
+        return False
+    raise HTTPException(status_code=422, detail=f"Geçersiz bool değeri: {value}")
+
+@app.post(
+    "/process-pdf/upload",
+    response_model=APIResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary"},
+                            "diagnostics": {"type": "string", "enum": ["none", "summary", "full"], "default": "full"},
+                            "profile": {"type": "boolean", "default": False}
+                        }
+                    }
+                }
+            }
+        }
+    }
+)
+async def process_pdf_upload(request: Request, x_profile_token: Optional[str] = Header(None)):
+    """Doğrudan yüklenen PDF dosyasını işleyen endpoint.
+    Gövde okunurken ayrıştırılır; sınır aşılırsa okuma hemen kesilir."""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="multipart/form-data bekleniyor")
+
+    # Gövde hiç okunmadan Content-Length ile reddet
+    max_body = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Geçersiz Content-Length")
+        if declared > max_body:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF dosyası çok büyük (en fazla {MAX_UPLOAD_BYTES} bayt)"
             )
-            
-        except Exception as e:
-            # Hata durumunda geçici dosyayı silmeyi dene
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-            raise e
-            
+
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+            temp_path = temp_file.name
+            receiver = _UploadReceiver(boundary, temp_file)
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                # Content-Length yoksa ya da yanlışsa toplam gövdeyi de sınırla
+                if received > max_body:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"PDF dosyası çok büyük (en fazla {MAX_UPLOAD_BYTES} bayt)"
+                    )
+                receiver.parser.write(chunk)
+            receiver.parser.finalize()
+
+        if not receiver.finished:
+            # Kapanış sınırı gelmeden kesilen gövde
+            raise HTTPException(status_code=400, detail="Multipart gövdesi eksik")
+        if not receiver.has_file:
+            raise HTTPException(status_code=400, detail="file alanı eksik")
+        if receiver.size == 0:
+            raise HTTPException(status_code=400, detail="PDF dosyası boş")
+
+        diagnostics = receiver.field("diagnostics", "full")
+        if diagnostics not in DIAGNOSTICS_LEVELS:
+            raise HTTPException(status_code=422, detail=f"Geçersiz tanılama seviyesi: {diagnostics}")
+        profile = _parse_form_bool(receiver.field("profile", "false"))
+        if profile:
+            _check_profile_token(x_profile_token)
+
+        logger.info(f"PDF başarıyla alındı: {receiver.filename} -> {temp_path} ({receiver.size} bayt)")
+
+        # Geçici dosya işlendikten sonra _process_temp_pdf tarafından silinir
+        path, temp_path = temp_path, None
+        return await _process_temp_pdf(path, receiver.filename, diagnostics, profile=profile)
+
+    except HTTPException:
+        raise
+    except MultipartParseError as e:
+        raise HTTPException(status_code=400, detail=f"Geçersiz multipart gövdesi: {str(e)}")
     except Exception as e:
         logger.error(f"PDF işlenirken hata: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+@app.on_event("startup")
+async def register_lane_metrics():
+    """Henüz istek almamış işçiler de /metrics toplamında görünsün"""
+    publish_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    """Şerit bazında kuyruk, eşzamanlılık ve gecikme metrikleri.
+    lanes tüm uvicorn işçilerinin toplamı, workers işçi (pid) bazındaki değerlerdir."""
+    return collect_metrics()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,68 @@
+"""pdf_reader modülünün açılış (import) süresini ölçer.
+
+Kullanım:
+    python bench_import.py                # pdf_reader
+    python bench_import.py --module api   # API modülü
+    python bench_import.py --max-ms 500   # eşik aşılırsa çıkış kodu 1
+
+`python -X importtime` çıktısını ayrıştırır, en pahalı modülleri listeler ve
+ağır opsiyonel arka uçların (PyMuPDF, pdfminer, pdf2image, pytesseract)
+açılışta yüklenmediğini doğrular.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Yalnızca ilk kullanımda yüklenmesi gereken modüller
+LAZY_MODULES = ("fitz", "pdfminer.high_level", "pdf2image", "pytesseract")
+
+
+def measure(module):
+    """Modülü temiz bir yorumlayıcıda import edip importtime satırlarını döndürür."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} import edilemedi:\n{proc.stderr}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        # Biçim: "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import süresi ölçümü")
+    parser.add_argument("--module", default="pdf_reader")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None, help="Toplam süre eşiği (ms)")
+    args = parser.parse_args()
+
+    entries = measure(args.module)
+    total = next((c for n, _, c in entries if n == args.module), 0)
+
+    print(f"{args.module} toplam import süresi: {total / 1000:.1f} ms")
+    print(f"{'kümülatif (ms)':>15} {'kendi (ms)':>11}  modül")
+    for name, self_us, cumulative_us in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>11.1f}  {name}")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES if any(n == m for n, _, _ in entries)]
+    if eager:
+        print(f"HATA: açılışta yüklenmemesi gereken modüller yüklendi: {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and total / 1000 > args.max_ms:
+        print(f"HATA: import süresi eşiği aşıldı ({total / 1000:.1f} ms > {args.max_ms} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""/process-pdf için çevrimdışı yük testi aracı.
+
+Yerel bir aiohttp sunucusu örnek PDF'leri (corpus) sunar; isteğe bağlı gecikme,
+yavaş gövde ve yarıda kesilen gövde enjekte edilebilir. API belirtilen
+eşzamanlılık ve geliş hızıyla çalıştırılır; verim, gecikme yüzdelikleri, hata
+oranları ve işçi RSS değerleri raporlanır. Ağ erişimi gerektirmez.
+
+Kullanım:
+    # Çalışan bir API'ye karşı (RSS için uvicorn ana süreç PID'i verilebilir)
+    python loadtest.py --corpus ./samples --api-url http://127.0.0.1:8000 --api-pid 1234
+
+    # API'yi 4 işçiyle kendisi başlatarak, saniyede 5 istek, 60 saniye
+    python loadtest.py --corpus ./samples --spawn-workers 4 --rate 5 --duration 60
+
+    # Yavaş ve kesik gövdeler
+    python loadtest.py --corpus ./samples --origin-latency-ms 200 --origin-slow-bps 65536 --origin-truncate-ratio 0.1
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+# --- Yerel PDF kaynağı -------------------------------------------------------
+
+def build_origin(corpus, latency_ms=0, slow_bps=0, truncate_ratio=0.0):
+    """Corpus'taki PDF'leri sunan aiohttp uygulamasını oluşturur"""
+    files = {}
+    for name in sorted(os.listdir(corpus)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(corpus, name), "rb") as f:
+                files[name] = f.read()
+    if not files:
+        raise SystemExit(f"Corpus dizininde PDF bulunamadı: {corpus}")
+
+    async def serve_pdf(request):
+        data = files.get(request.match_info["name"])
+        if data is None:
+            raise web.HTTPNotFound()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        truncate = truncate_ratio and random.random() < truncate_ratio
+        if not slow_bps and not truncate:
+            return web.Response(body=data, content_type="application/pdf")
+
+        response = web.StreamResponse(headers={"Content-Type": "application/pdf"})
+        response.content_length = len(data)
+        await response.prepare(request)
+        body = data[:len(data) // 2] if truncate else data
+        chunk_size = max(slow_bps // 10, 1024) if slow_bps else len(body)
+        for offset in range(0, len(body), chunk_size):
+            await response.write(body[offset:offset + chunk_size])
+            if slow_bps:
+                await asyncio.sleep(chunk_size / slow_bps)
+        if truncate:
+            # Content-Length'ten kısa gövde gönderip bağlantıyı kes
+            request.transport.close()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/{name}", serve_pdf)
+    return app, files
+
+
+# --- İşçi RSS ölçümü -----------------------------------------------------------
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree(root_pid):
+    """root_pid ve tüm alt süreçlerinin PID'leri (/proc üzerinden)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # pid (comm) state ppid ...; comm boşluk içerebilir
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+async def sample_rss(root_pid, samples, interval=0.5):
+    """Süreç ağacının RSS değerlerini periyodik olarak örnekler"""
+    while True:
+        samples.append({pid: _rss_kb(pid) for pid in _process_tree(root_pid)})
+        await asyncio.sleep(interval)
+
+
+# --- Yük üretici -------------------------------------------------------------
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def drive(args, origin_url, files):
+    """API'ye istekleri gönderir ve her isteğin sonucunu döndürür.
+
+    Kapalı döngüde (--rate 0) yeni istek ancak bir slot boşalınca gönderilir ve
+    gecikme gönderimden ölçülür. Açık döngüde gelişler API'nin hızından bağımsız
+    olarak planlanır; gecikme planlanan geliş anından ölçülür, böylece slot
+    beklerken geçen kuyruk süresi de gecikmeye dahil olur."""
+    results = []
+    slots = asyncio.Semaphore(args.concurrency)
+    pdfs = itertools.cycle(sorted(files))
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    open_loop = bool(args.rate)
+
+    async def one(session, name, arrival):
+        if open_loop:
+            await slots.acquire()
+        # Planlanan gelişten gönderime kadar istemci tarafında geçen bekleme
+        lag = time.monotonic() - arrival
+        try:
+            if args.mode == "upload":
+                # Corpus baytları önceden yüklendi; kaynak sunucu süresi ölçüme karışmaz
+                form = aiohttp.FormData()
+                form.add_field("file", files[name], filename=name, content_type="application/pdf")
+                form.add_field("diagnostics", args.diagnostics)
+                request = session.post(f"{args.api_url}/process-pdf/upload", data=form)
+            else:
+                payload = {"pdf_url": f"{origin_url}/{name}", "diagnostics": args.diagnostics}
+                request = session.post(f"{args.api_url}/process-pdf", json=payload)
+            async with request as response:
+                data = await response.json(content_type=None)
+                ok = response.status == 200 and isinstance(data, dict) and data.get("status") is True
+                results.append({"latency": time.monotonic() - arrival, "lag": lag, "status": response.status, "ok": ok})
+        except Exception as e:
+            results.append({"latency": time.monotonic() - arrival, "lag": lag, "status": type(e).__name__, "ok": False})
+        finally:
+            slots.release()
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        tasks = []
+        start = time.monotonic()
+        deadline = start + args.duration if args.duration else None
+        next_arrival = start
+        sent = 0
+        while (args.requests is None or sent < args.requests) and (deadline is None or next_arrival < deadline):
+            if open_loop:
+                # Açık döngü: Poisson gelişleri, planlanan zamana göre (birikmiş gecikme telafi edilir)
+                delay = next_arrival - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                arrival = next_arrival
+                next_arrival += random.expovariate(args.rate)
+            else:
+                await slots.acquire()
+                arrival = time.monotonic()
+                next_arrival = arrival
+            tasks.append(asyncio.create_task(one(session, next(pdfs), arrival)))
+            sent += 1
+        await asyncio.gather(*tasks)
+    return results
+
+
+async def fetch_lane_metrics(api_url):
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            async with session.get(f"{api_url}/metrics") as response:
+                return await response.json()
+    except Exception:
+        return None
+
+
+async def wait_for_api(api_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2)) as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{api_url}/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise SystemExit(f"API {timeout} saniyede ayağa kalkmadı: {api_url}")
+
+
+# Planlanan gelişinden bu kadar sonra gönderilen istek "geç" sayılır (sn)
+LATE_ARRIVAL_SECONDS = 0.01
+
+# Test süresince artışı raporlanan birikimli şerit sayaçları
+_LANE_COUNTERS = ("completed", "failed", "rejected", "timeouts", "totalSeconds")
+
+
+def lane_deltas(before, after):
+    """Test öncesi/sonrası /metrics toplamlarından şerit başına artışlar"""
+    deltas = {}
+    before_lanes = (before or {}).get("lanes", {})
+    for name, stats in (after or {}).get("lanes", {}).items():
+        base = before_lanes.get(name, {})
+        delta = {key: round((stats.get(key) or 0) - (base.get(key) or 0), 3) for key in _LANE_COUNTERS}
+        delta["avgSeconds"] = round(delta["totalSeconds"] / delta["completed"], 3) if delta["completed"] else None
+        deltas[name] = delta
+    return deltas
+
+
+def report(results, elapsed, rss_samples, lane_metrics, lane_metrics_before=None):
+    latencies = [r["latency"] for r in results]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["status"]] = errors.get(r["status"], 0) + 1
+
+    print(f"İstek: {len(results)}  Süre: {elapsed:.1f} sn  Verim: {len(results) / max(elapsed, 1e-9):.2f} istek/sn")
+    print("Gecikme (sn): " + "  ".join(
+        f"p{p}={percentile(latencies, p):.3f}" for p in (50, 90, 95, 99) if latencies
+    ) + (f"  max={max(latencies):.3f}" if latencies else ""))
+    # Açık döngüde planlanan gelişinden geç gönderilen (istemci slotu bekleyen) istekler
+    lags = [r["lag"] for r in results if r.get("lag", 0) > LATE_ARRIVAL_SECONDS]
+    if lags:
+        print(f"Geç gönderilen istek: {len(lags)} ({len(lags) / len(results):.1%})  "
+              f"bekleme p99={percentile(lags, 99):.3f}  max={max(lags):.3f} sn (gecikmeye dahil)")
+    failed = sum(errors.values())
+    print(f"Hata oranı: {failed / max(len(results), 1):.1%}  " + ", ".join(f"{k}: {v}" for k, v in sorted(errors.items(), key=str)))
+
+    if rss_samples:
+        peak = {}
+        for sample in rss_samples:
+            for pid, rss in sample.items():
+                peak[pid] = max(peak.get(pid, 0), rss)
+        last = rss_samples[-1]
+        print("İşçi RSS (MB): " + "  ".join(
+            f"{pid}: son={last.get(pid, 0) / 1024:.0f} tepe={peak[pid] / 1024:.0f}" for pid in sorted(peak)
+        ))
+        print(f"Toplam tepe RSS: {max(sum(s.values()) for s in rss_samples) / 1024:.0f} MB")
+
+    if lane_metrics:
+        if lane_metrics.get("scope", "all-workers") != "all-workers" or "workerCount" not in lane_metrics:
+            # LANE_METRICS_DIR tanımsız (ya da eski API): tek işçinin sayaçları; toplam gibi gösterme
+            print("Şerit metrikleri yalnızca yanıt veren tek işçiye ait (toplam değil)")
+        else:
+            print(f"Şerit metrikleri: {lane_metrics['workerCount']} işçinin toplamı, test süresince artış")
+        for name, delta in lane_deltas(lane_metrics_before, lane_metrics).items():
+            print(f"Şerit {name}: " + ", ".join(f"{k}={v}" for k, v in delta.items()))
+
+
+async def main(args):
+    origin_app, files = build_origin(args.corpus, args.origin_latency_ms, args.origin_slow_bps, args.origin_truncate_ratio)
+    runner = web.AppRunner(origin_app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.origin_port)
+    await site.start()
+    origin_port = runner.addresses[0][1]
+    origin_url = f"http://127.0.0.1:{origin_port}"
+    print(f"PDF kaynağı: {origin_url} ({len(files)} dosya)")
+
+    api_process = None
+    api_pid = args.api_pid
+    metrics_dir = None
+    if args.spawn_workers:
+        port = args.api_url.rsplit(":", 1)[1].split("/")[0]
+        # Başlatılan örnek kendi metrik dizinini kullanır; aynı makinedeki servisle karışmaz
+        metrics_dir = tempfile.TemporaryDirectory(prefix="loadtest-lane-metrics-")
+        api_process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", port,
+             "--workers", str(args.spawn_workers), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, "LANE_METRICS_DIR": metrics_dir.name},
+        )
+        api_pid = api_process.pid
+
+    rss_samples = []
+    sampler = None
+    try:
+        await wait_for_api(args.api_url)
+        if api_pid and os.path.isdir("/proc"):
+            sampler = asyncio.create_task(sample_rss(api_pid, rss_samples))
+        lane_metrics_before = await fetch_lane_metrics(args.api_url)
+        start = time.monotonic()
+        results = await drive(args, origin_url, files)
+        elapsed = time.monotonic() - start
+        lane_metrics = await fetch_lane_metrics(args.api_url)
+    finally:
+        if sampler:
+            sampler.cancel()
+        if api_process:
+            api_process.terminate()
+            api_process.wait()
+        if metrics_dir:
+            metrics_dir.cleanup()
+        await runner.cleanup()
+
+    report(results, elapsed, rss_samples, lane_metrics, lane_metrics_before)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="/process-pdf çevrimdışı yük testi")
+    parser.add_argument("--corpus", required=True, help="Örnek PDF'lerin bulunduğu dizin")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--api-pid", type=int, default=None, help="RSS ölçümü için uvicorn ana süreç PID'i")
+    parser.add_argument("--spawn-workers", type=int, default=0, help="API'yi bu kadar işçiyle başlat")
+    parser.add_argument("--mode", choices=("url", "upload"), default="url")
+    parser.add_argument("--diagnostics", choices=("none", "summary", "full"), default="summary")
+    parser.add_argument("--concurrency", type=int, default=8, help="Aynı anda açık en fazla istek")
+    parser.add_argument("--rate", type=float, default=0, help="Saniyedeki geliş hızı (0: kapalı döngü)")
+    parser.add_argument("--requests", type=int, default=None, help="Toplam istek sayısı")
+    parser.add_argument("--duration", type=float, default=None, help="Test süresi (sn)")
+    parser.add_argument("--request-timeout", type=float, default=600)
+    parser.add_argument("--origin-port", type=int, default=0, help="0: rastgele boş port")
+    parser.add_argument("--origin-latency-ms", type=float, default=0, help="Yanıt öncesi gecikme")
+    parser.add_argument("--origin-slow-bps", type=int, default=0, help="Gövde hızı sınırı (bayt/sn)")
+    parser.add_argument("--origin-truncate-ratio", type=float, default=0.0, help="Yarıda kesilen yanıt oranı")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
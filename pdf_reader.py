@@ -1,37 +1,175 @@
 import json
 from PyPDF2 import PdfReader
 from datetime import datetime
+import hashlib
+import importlib
 import re
 import logging
 import os
 import shutil
+import tempfile
 from typing import Optional
 
-# Opsiyonel bağımlılıklar (fallback metin çıkarımı)
-try:
-    import fitz  # PyMuPDF
-except Exception:
-    fitz = None
-
-try:
-    from pdfminer.high_level import extract_text as pdfminer_extract_text
-except Exception:
-    pdfminer_extract_text = None
-
-try:
-    from pdf2image import convert_from_path
-except Exception:
-    convert_from_path = None
-
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
-
-# Loglama ayarları
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Opsiyonel bağımlılıklar (fallback metin çıkarımı) ilk kullanımda yüklenir;
+# böylece yalnızca PyPDF2 gereken işçiler ağır modüllerin yükleme maliyetini ödemez
+_BACKEND_LOADERS = {
+    "fitz": lambda: importlib.import_module("fitz"),  # PyMuPDF
+    "pdfminer": lambda: importlib.import_module("pdfminer.high_level").extract_text,
+    "pdf2image": lambda: importlib.import_module("pdf2image").convert_from_path,
+    "pytesseract": lambda: importlib.import_module("pytesseract"),
+}
+_backends = {}
+_ocr_lang_cache = None
+
+
+def _get_backend(name: str):
+    """Opsiyonel arka ucu ilk kullanımda yükler; yüklenemezse None döner."""
+    if name not in _backends:
+        try:
+            _backends[name] = _BACKEND_LOADERS[name]()
+        except Exception as e:
+            logger.debug(f"Opsiyonel arka uç yüklenemedi ({name}): {e}")
+            _backends[name] = None
+    return _backends[name]
+
+
+def _get_ocr_lang(pytesseract) -> str:
+    """Tesseract dilini bir kez tespit eder; TR dili yoksa ENG'e düşer."""
+    global _ocr_lang_cache
+    if _ocr_lang_cache is None:
+        ocr_lang = "eng"
+        try:
+            available_langs = pytesseract.get_languages(config="")
+            if isinstance(available_langs, list) and "tur" in available_langs:
+                ocr_lang = "tur+eng"
+        except Exception:
+            pass
+        _ocr_lang_cache = ocr_lang
+    return _ocr_lang_cache
+
+
+def preload_backends(names=None) -> dict:
+    """Opsiyonel arka uçları önceden yükler (pre-fork işçiler için ısınma).
+    Hangi arka ucun kullanılabilir olduğunu döndürür."""
+    loaded = {}
+    for name in (names or _BACKEND_LOADERS):
+        if name not in _BACKEND_LOADERS:
+            raise ValueError(f"Bilinmeyen arka uç: {name}")
+        loaded[name] = _get_backend(name) is not None
+    pytesseract = _backends.get("pytesseract")
+    if pytesseract is not None:
+        _get_ocr_lang(pytesseract)
+    return loaded
+
+# Tanılama seviyeleri: none -> hiç toplanmaz, summary -> sayaçlar ve sayfa özetleri,
+# full -> başlık/öğretmen adayları ve regex kaçırma örnekleri dahil
+DIAGNOSTICS_LEVELS = ("none", "summary", "full")
+
+# İşleme şeritleri: metin katmanı temiz belgeler hızlı şeride, taranmış/bozuk belgeler OCR şeridine
+FAST_LANE = "fast"
+OCR_LANE = "ocr"
+
+# İş başına kaynak sınırları (0: kapalı). Büyük ya da kötü niyetli PDF'ler
+# bir işçiyi bellek yetersizliğine sürükleyip diğer istekleri düşürmesin diye
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+MAX_RASTER_PIXELS = int(os.getenv("PDF_MAX_RASTER_PIXELS", str(40_000_000)))
+MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", str(5_000_000)))
+MAX_JOB_RSS_MB = int(os.getenv("PDF_MAX_JOB_RSS_MB", "0"))
+OCR_DPI = 300
+
+
+class ResourceLimitError(Exception):
+    """İş bütçesindeki bir sınır aşıldığında fırlatılır"""
+
+    def __init__(self, limit: str, message: str, page: int = 0):
+        super().__init__(message)
+        self.limit = limit
+        self.page = page
+
+
+def _current_rss_bytes() -> int:
+    """Sürecin anlık RSS değeri (Linux dışında 0)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class JobBudget:
+    """Tek bir PDF işi için sayfa, raster, metin ve bellek bütçesi.
+    Bellek, iş başındaki RSS'e göre artış olarak izlenir. RSS süreç geneli
+    ölçüldüğünden aynı süreçteki eşzamanlı işlerin artışı da buna yansır; bu yüzden
+    max_rss_mb yalnızca süreçte tek iş çalışırken (ör. komut satırı) anlamlıdır."""
+
+    def __init__(self, max_pages=MAX_PAGES, max_raster_pixels=MAX_RASTER_PIXELS,
+                 max_text_chars=MAX_TEXT_CHARS, max_rss_mb=MAX_JOB_RSS_MB):
+        self.max_pages = max_pages
+        self.max_raster_pixels = max_raster_pixels
+        self.max_text_chars = max_text_chars
+        self.max_rss_mb = max_rss_mb
+        self.text_chars = 0
+        self.start_rss = _current_rss_bytes()
+        self.peak_rss = self.start_rss
+
+    def check_pages(self, page_count: int):
+        if self.max_pages and page_count > self.max_pages:
+            raise ResourceLimitError("pages", f"Sayfa sayısı sınırı aşıldı: {page_count} > {self.max_pages}")
+
+    def check_raster(self, reader: Optional[PdfReader], page_index: int, dpi: int = OCR_DPI):
+        """Sayfa, verilen DPI'da render edilmeden önce piksel sayısını denetler"""
+        if not self.max_raster_pixels or reader is None:
+            return
+        try:
+            box = reader.pages[page_index].mediabox
+            width, height = float(box.width), float(box.height)
+        except Exception:
+            return
+        pixels = int(abs(width) / 72 * dpi * abs(height) / 72 * dpi)
+        if pixels > self.max_raster_pixels:
+            raise ResourceLimitError(
+                "raster",
+                f"Sayfa {page_index+1} {dpi} DPI'da {pixels} piksel, sınır {self.max_raster_pixels}",
+                page_index + 1
+            )
+
+    def add_text(self, length: int, page_index: int):
+        self.text_chars += length
+        if self.max_text_chars and self.text_chars > self.max_text_chars:
+            raise ResourceLimitError(
+                "text",
+                f"Çıkarılan metin sınırı aşıldı: {self.text_chars} > {self.max_text_chars} karakter",
+                page_index + 1
+            )
+
+    def sample_rss(self, page_index: int = -1):
+        rss = _current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        growth = rss - self.start_rss
+        if self.max_rss_mb and growth > self.max_rss_mb * 1024 * 1024:
+            raise ResourceLimitError(
+                "rss",
+                f"İş başına bellek sınırı aşıldı: +{growth // (1024 * 1024)} MB > {self.max_rss_mb} MB",
+                page_index + 1
+            )
+
+    def memory_diagnostics(self) -> dict:
+        """İş başından bu yana tepe RSS artışı ve süreç geneli tepe RSS (MB)"""
+        return {
+            "peakRssGrowthMb": round(max(self.peak_rss - self.start_rss, 0) / (1024 * 1024), 1),
+            "processPeakRssMb": round(self.peak_rss / (1024 * 1024), 1)
+        }
+
+
+# Tanılama için potansiyel sınıf başlığı satırlarını yakalayan tek desen
+_CLASS_HEADER_CANDIDATE_RE = re.compile(
+    r"\b(?:Sınıf|Şubesi|Listesi|Anaokulu|Anasınıfı|Ana\s*Sınıfı|Öğrenci)\b",
+    flags=re.IGNORECASE
+)
+_STUDENT_MISS_CANDIDATE_RE = re.compile(r"\b\d{1,4}\b")
+
 
 def _looks_garbled(text: Optional[str]) -> bool:
     """Metnin bozuk/PUA karakterleri yoğun içerip içermediğini tespit eder."""
@@ -81,153 +219,158 @@ def _looks_fragmented(text: Optional[str]) -> bool:
     return (short / max(len(lines), 1)) > 0.35
 
 
-def extract_text_with_fallback(file_path: str, page_index: int, reader: Optional[PdfReader] = None, force_ocr: bool = False) -> str:
-    """Sayfa metnini PyPDF2 -> PyMuPDF -> pdfminer -> OCR sırası ile dener.
-    force_ocr=True ise doğrudan OCR uygular."""
-    if force_ocr:
-        # OCR'a zorla
-        if convert_from_path is not None and pytesseract is not None and os.path.exists(file_path):
-            try:
-                try:
-                    pdftoppm_path = shutil.which("pdftoppm")
-                    if not pdftoppm_path:
-                        for candidate in [
-                            "/usr/bin/pdftoppm",
-                            "/usr/local/bin/pdftoppm",
-                            "/opt/homebrew/bin/pdftoppm",
-                            "/snap/bin/pdftoppm",
-                        ]:
-                            if os.path.exists(candidate):
-                                pdftoppm_path = candidate
-                                break
-                    poppler_dir = os.path.dirname(pdftoppm_path) if pdftoppm_path else None
-                except Exception:
-                    poppler_dir = None
-                logger.info(f"OCR (force) başlıyor: sayfa={page_index+1}, poppler_dir={poppler_dir}")
-                images = convert_from_path(
-                    file_path,
-                    first_page=page_index + 1,
-                    last_page=page_index + 1,
-                    dpi=300,
-                    fmt="png",
-                    poppler_path=poppler_dir
-                )
-                if images:
-                    logger.info(f"OCR (force) görüntü üretildi: sayfa={page_index+1}")
-                    ocr_lang = "eng"
-                    try:
-                        available_langs = pytesseract.get_languages(config="")
-                        if isinstance(available_langs, list) and "tur" in available_langs:
-                            ocr_lang = "tur+eng"
-                    except Exception:
-                        pass
-                    try:
-                        logger.info(f"OCR (force) tesseract çalışıyor: lang={ocr_lang}")
-                        ocr_text = pytesseract.image_to_string(
-                            images[0],
-                            lang=ocr_lang,
-                            config="--oem 1 --psm 4 -c preserve_interword_spaces=1",
-                        )
-                    except Exception:
-                        ocr_text = pytesseract.image_to_string(images[0])
-                    logger.info(f"OCR (force) tamamlandı: sayfa={page_index+1}, uzunluk={len(ocr_text or '')}")
-                    return ocr_text or ""
-            except Exception as e:
-                logger.debug(f"OCR (force) metin çıkarımı hatası (sayfa {page_index+1}): {e}")
-        return ""
-    # 1) PyPDF2
+def _poppler_dir() -> Optional[str]:
+    """Poppler yolunu otomatik tespit eder (PATH'e bağımlı kalma)"""
     try:
-        if reader is not None:
-            try:
-                text = reader.pages[page_index].extract_text()
-            except Exception:
-                text = None
-            if text and not _looks_garbled(text):
-                return text
+        pdftoppm_path = shutil.which("pdftoppm")
+        if not pdftoppm_path:
+            for candidate in [
+                "/usr/bin/pdftoppm",
+                "/usr/local/bin/pdftoppm",
+                "/opt/homebrew/bin/pdftoppm",
+                "/snap/bin/pdftoppm",
+            ]:
+                if os.path.exists(candidate):
+                    pdftoppm_path = candidate
+                    break
+        return os.path.dirname(pdftoppm_path) if pdftoppm_path else None
+    except Exception:
+        return None
+
+
+def _extract_pypdf2(reader: Optional[PdfReader], page_index: int) -> Optional[str]:
+    """PyPDF2 ile sayfa metni"""
+    if reader is None:
+        return None
+    try:
+        return reader.pages[page_index].extract_text()
+    except Exception:
+        return None
+
+
+def _extract_pymupdf(file_path: str, page_index: int) -> Optional[str]:
+    """PyMuPDF ile sayfa metni"""
+    fitz = _get_backend("fitz")
+    if fitz is None:
+        return None
+    try:
+        with fitz.open(file_path) as doc:
+            if 0 <= page_index < doc.page_count:
+                page = doc.load_page(page_index)
+                return page.get_text("text")
     except Exception as e:
-        logger.debug(f"PyPDF2 metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+        logger.debug(f"PyMuPDF metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+    return None
 
-    # 2) PyMuPDF
-    if fitz is not None:
-        try:
-            with fitz.open(file_path) as doc:
-                if 0 <= page_index < doc.page_count:
-                    page = doc.load_page(page_index)
-                    text = page.get_text("text")
-                    if text and not _looks_garbled(text):
-                        return text
-        except Exception as e:
-            logger.debug(f"PyMuPDF metin çıkarımı hatası (sayfa {page_index+1}): {e}")
 
-    # 3) pdfminer
-    if pdfminer_extract_text is not None:
-        try:
-            text = pdfminer_extract_text(file_path, page_numbers=[page_index])
-            if text and not _looks_garbled(text):
-                return text
-        except Exception as e:
-            logger.debug(f"pdfminer metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+def _extract_pdfminer(file_path: str, page_index: int) -> Optional[str]:
+    """pdfminer ile sayfa metni"""
+    pdfminer_extract_text = _get_backend("pdfminer")
+    if pdfminer_extract_text is None:
+        return None
+    try:
+        return pdfminer_extract_text(file_path, page_numbers=[page_index])
+    except Exception as e:
+        logger.debug(f"pdfminer metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+    return None
 
-    # 4) OCR (pdf2image + pytesseract)
-    if convert_from_path is not None and pytesseract is not None and os.path.exists(file_path):
-        try:
-            # Poppler yolunu otomatik tespit et (PATH'e bağımlı kalma)
-            try:
-                pdftoppm_path = shutil.which("pdftoppm")
-                if not pdftoppm_path:
-                    for candidate in [
-                        "/usr/bin/pdftoppm",
-                        "/usr/local/bin/pdftoppm",
-                        "/opt/homebrew/bin/pdftoppm",
-                        "/snap/bin/pdftoppm",
-                    ]:
-                        if os.path.exists(candidate):
-                            pdftoppm_path = candidate
-                            break
-                poppler_dir = os.path.dirname(pdftoppm_path) if pdftoppm_path else None
-            except Exception:
-                poppler_dir = None
-            logger.info(f"OCR fallback başlıyor: sayfa={page_index+1}, poppler_dir={poppler_dir}")
-            images = convert_from_path(
+
+def _extract_ocr(file_path: str, page_index: int, label: str, reader: Optional[PdfReader] = None, budget: Optional[JobBudget] = None) -> Optional[str]:
+    """pdf2image + pytesseract ile sayfa metni; label log mesajları içindir.
+    Sayfa geçici dizine render edilir ve tesseract dosyayı doğrudan okur;
+    raster görüntü Python belleğinde tutulmaz, dizin OCR biter bitmez silinir."""
+    convert_from_path = _get_backend("pdf2image")
+    pytesseract = _get_backend("pytesseract")
+    if convert_from_path is None or pytesseract is None or not os.path.exists(file_path):
+        return None
+    if budget is not None:
+        budget.check_raster(reader, page_index)
+    try:
+        poppler_dir = _poppler_dir()
+        logger.info(f"OCR {label} başlıyor: sayfa={page_index+1}, poppler_dir={poppler_dir}")
+        with tempfile.TemporaryDirectory(prefix="ocr-") as output_folder:
+            image_paths = convert_from_path(
                 file_path,
                 first_page=page_index + 1,
                 last_page=page_index + 1,
-                dpi=300,
+                dpi=OCR_DPI,
                 fmt="png",
-                poppler_path=poppler_dir
+                poppler_path=poppler_dir,
+                output_folder=output_folder,
+                paths_only=True
             )
-            if images:
-                logger.info(f"OCR fallback görüntü üretildi: sayfa={page_index+1}")
-                # Türkçe + İngilizce dene; TR dili yoksa ENG'e düş
-                ocr_lang = "eng"
-                try:
-                    available_langs = pytesseract.get_languages(config="")
-                    if isinstance(available_langs, list) and "tur" in available_langs:
-                        ocr_lang = "tur+eng"
-                except Exception:
-                    pass
-                try:
-                    logger.info(f"OCR fallback tesseract çalışıyor: lang={ocr_lang}")
-                    ocr_text = pytesseract.image_to_string(
-                        images[0],
-                        lang=ocr_lang,
-                        config="--oem 1 --psm 4 -c preserve_interword_spaces=1",
-                    )
-                except Exception:
-                    ocr_text = pytesseract.image_to_string(images[0])
-                logger.info(f"OCR fallback tamamlandı: sayfa={page_index+1}, uzunluk={len(ocr_text or '')}")
-                if ocr_text and not _looks_garbled(ocr_text):
-                    return ocr_text
-        except Exception as e:
-            logger.debug(f"OCR metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+            if not image_paths:
+                return None
+            logger.info(f"OCR {label} görüntü üretildi: sayfa={page_index+1}")
+            # Türkçe + İngilizce dene; TR dili yoksa ENG'e düş
+            ocr_lang = _get_ocr_lang(pytesseract)
+            try:
+                logger.info(f"OCR {label} tesseract çalışıyor: lang={ocr_lang}")
+                ocr_text = pytesseract.image_to_string(
+                    image_paths[0],
+                    lang=ocr_lang,
+                    config="--oem 1 --psm 4 -c preserve_interword_spaces=1",
+                )
+            except Exception:
+                ocr_text = pytesseract.image_to_string(image_paths[0])
+        logger.info(f"OCR {label} tamamlandı: sayfa={page_index+1}, uzunluk={len(ocr_text or '')}")
+        return ocr_text
+    except Exception as e:
+        logger.debug(f"OCR {label} metin çıkarımı hatası (sayfa {page_index+1}): {e}")
+    return None
+
+
+def extract_text_with_fallback(file_path: str, page_index: int, reader: Optional[PdfReader] = None, force_ocr: bool = False, budget: Optional[JobBudget] = None) -> str:
+    """Sayfa metnini PyPDF2 -> PyMuPDF -> pdfminer -> OCR sırası ile dener.
+    force_ocr=True ise doğrudan OCR uygular. budget verilirse OCR öncesi raster sınırı denetlenir."""
+    if force_ocr:
+        # OCR'a zorla
+        return _extract_ocr(file_path, page_index, "(force)", reader, budget) or ""
+
+    # 1) PyPDF2
+    text = _extract_pypdf2(reader, page_index)
+    if text and not _looks_garbled(text):
+        return text
+
+    # 2) PyMuPDF, 3) pdfminer
+    for backend in (_extract_pymupdf, _extract_pdfminer):
+        text = backend(file_path, page_index)
+        if text and not _looks_garbled(text):
+            return text
+
+    # 4) OCR (pdf2image + pytesseract)
+    ocr_text = _extract_ocr(file_path, page_index, "fallback", reader, budget)
+    if ocr_text and not _looks_garbled(ocr_text):
+        return ocr_text
 
     # Olmadıysa, en azından PyPDF2 çıktısını döndür (bozuk olabilir)
+    return _extract_pypdf2(reader, page_index) or ""
+
+
+def classify_pdf(file_path: str) -> str:
+    """İlk sayfa metnini PyPDF2 -> PyMuPDF -> pdfminer sırası ile dener ve belgenin
+    işleneceği şeridi belirler. Bu arka uçlardan biri temiz (bozuk ya da parçalı olmayan)
+    metin verirse hızlı şerit, hiçbiri veremezse OCR şeridi döner."""
     try:
-        if reader is not None:
-            return reader.pages[page_index].extract_text() or ""
-    except Exception:
-        pass
-    return ""
+        reader = PdfReader(file_path)
+        if len(reader.pages) == 0:
+            # Boş belge process_pdf içinde hızlıca hata verir
+            return FAST_LANE
+    except Exception as e:
+        logger.debug(f"Şerit sınıflandırması için PDF açılamadı: {e}")
+        return FAST_LANE
+    # 1) PyPDF2
+    text = _extract_pypdf2(reader, 0)
+    if not _looks_garbled(text) and not _looks_fragmented(text):
+        return FAST_LANE
+
+    # 2) PyMuPDF, 3) pdfminer (PyPDF2'nin okuyamadığı gömülü fontlar için)
+    for backend in (_extract_pymupdf, _extract_pdfminer):
+        text = backend(file_path, 0)
+        if not _looks_garbled(text) and not _looks_fragmented(text):
+            return FAST_LANE
+    return OCR_LANE
+
 
 def extract_school_info(text_lines):
     """Okul bilgilerini satırlardan ayıklar"""
@@ -443,26 +586,173 @@ def extract_class_info(text, teacher_line=None):
         }
     return None
 
+def _update_class_totals(class_entry):
+    """Sınıfın istatistiklerini ve parmak izini öğrenci listesine göre günceller"""
+    students = class_entry["students"]
+    total = len(students)
+    females = sum(1 for s in students if s["gender"] == "female")
+    males = total - females
+    class_entry["statistics"] = {
+        "totalStudents": total,
+        "genderDistribution": {
+            "female": females,
+            "male": males
+        }
+    }
+    class_entry["fingerprint"] = class_fingerprint(class_entry)
+
 def save_current_class(current_class, students, result):
-    """Mevcut sınıfı sonuçlara ekler"""
+    """Mevcut sınıfı sonuçlara ekler; başlığı sonraki sayfada tekrarlanan sınıf
+    mevcut kayıtla birleştirilir"""
     if current_class:
-        total = len(students)
-        females = sum(1 for s in students if s["gender"] == "female")
-        males = total - females
+        key = class_key(current_class)
+        existing = next((c for c in result["data"]["classes"] if class_key(c) == key), None)
+        if existing is not None:
+            existing["students"].extend(students)
+            teachers = existing["classInfo"].setdefault("teachers", [])
+            for teacher in current_class["classInfo"].get("teachers", []):
+                if not any(t.get("name") == teacher.get("name") for t in teachers):
+                    teachers.append(teacher)
+            _update_class_totals(existing)
+            logger.info(f"Sınıf devamı birleştirildi: {len(students)} öğrenci eklendi")
+            return True
         current_class["students"] = students
-        current_class["statistics"] = {
-            "totalStudents": total,
-            "genderDistribution": {
-                "female": females,
-                "male": males
-            }
-        }
+        _update_class_totals(current_class)
         result["data"]["classes"].append(current_class)
-        logger.info(f"Sınıf kaydedildi: {total} öğrenci")
+        logger.info(f"Sınıf kaydedildi: {len(students)} öğrenci")
         return True
     return False
 
-def process_anaokulu_pdf(reader, pdf_url=None):
+# Diff sırasında karşılaştırılan öğrenci alanları; orderNo sıralamaya bağlı
+# olduğundan araya eklenen tek öğrenci tüm sınıfı "değişmiş" göstermesin diye dışarıda
+_STUDENT_DIFF_FIELDS = ("name", "surname", "gender")
+
+def class_key(class_entry):
+    """Sınıfı belgeler arasında tanımlayan anahtar (sınıf|şube|tür)"""
+    info = class_entry.get("classInfo", {})
+    return f"{info.get('grade', '')}|{info.get('section', '')}|{info.get('type', '')}"
+
+def class_fingerprint(class_entry):
+    """Sınıf anahtarı ve sıralı öğrenci numaralarından kararlı parmak izi üretir"""
+    student_ids = sorted(str(s.get("studentId", "")) for s in class_entry.get("students", []))
+    payload = class_key(class_entry) + "\n" + "\n".join(student_ids)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def group_classes(classes):
+    """Aynı anahtara sahip sınıf parçalarını öğrencilerini birleştirerek gruplar"""
+    grouped = {}
+    for class_entry in classes:
+        key = class_key(class_entry)
+        if key not in grouped:
+            grouped[key] = {"classInfo": class_entry.get("classInfo"), "students": []}
+        grouped[key]["students"].extend(class_entry.get("students", []))
+    return grouped
+
+def document_fingerprints(classes):
+    """Belge ve sınıf parmak izlerini {document, classes} biçiminde döndürür"""
+    class_fps = {key: class_fingerprint(entry) for key, entry in group_classes(classes).items()}
+    payload = "\n".join(f"{key}={fp}" for key, fp in sorted(class_fps.items()))
+    return {
+        "document": hashlib.sha256(payload.encode("utf-8")).hexdigest(),
+        "classes": class_fps
+    }
+
+def diff_rosters(previous, current_classes):
+    """Önceki çıktıya ya da parmak izi kümesine göre yalnızca değişenleri döndürür.
+
+    previous, önceki yanıtın `data` bloğu (classes listesi) ya da
+    `data["fingerprints"]` ile dönen {document, classes} kümesi olabilir.
+    Parmak izi kümesinde öğrenci verisi olmadığından değişen sınıflar için
+    öğrenci bazında fark yerine sınıfın güncel öğrenci listesi döner."""
+    previous = previous or {}
+    current_fps = document_fingerprints(current_classes)
+    current_by_key = group_classes(current_classes)
+
+    if isinstance(previous.get("classes"), list):
+        previous_by_key = group_classes(previous["classes"])
+        previous_fps = document_fingerprints(previous["classes"])
+    else:
+        previous_by_key = None
+        previous_fps = {
+            "document": previous.get("document"),
+            "classes": previous.get("classes") or {}
+        }
+
+    changes = []
+    unchanged = 0
+    for key, current in current_by_key.items():
+        previous_fp = previous_fps["classes"].get(key)
+        if previous_fp is None:
+            changes.append({
+                "classKey": key,
+                "status": "added",
+                "classInfo": current.get("classInfo"),
+                "fingerprint": current_fps["classes"][key],
+                "added": current.get("students", []),
+                "removed": [],
+                "changed": []
+            })
+            continue
+
+        if previous_by_key is None:
+            # Yalnızca parmak izi var: sınıf düzeyinde karşılaştır
+            if previous_fp == current_fps["classes"][key]:
+                unchanged += 1
+                continue
+            changes.append({
+                "classKey": key,
+                "status": "changed",
+                "classInfo": current.get("classInfo"),
+                "fingerprint": current_fps["classes"][key],
+                "students": current.get("students", [])
+            })
+            continue
+
+        # Önceki çıktı var: öğrenci numarası indeksleri ile öğrenci bazında karşılaştır
+        previous_students = {s.get("studentId"): s for s in previous_by_key[key].get("students", [])}
+        current_students = {s.get("studentId"): s for s in current.get("students", [])}
+        added = [s for sid, s in current_students.items() if sid not in previous_students]
+        removed = [s for sid, s in previous_students.items() if sid not in current_students]
+        changed = []
+        for sid, student in current_students.items():
+            before = previous_students.get(sid)
+            if before is not None and any(before.get(f) != student.get(f) for f in _STUDENT_DIFF_FIELDS):
+                changed.append({"studentId": sid, "before": before, "after": student})
+        if not (added or removed or changed):
+            unchanged += 1
+            continue
+        changes.append({
+            "classKey": key,
+            "status": "changed",
+            "classInfo": current.get("classInfo"),
+            "fingerprint": current_fps["classes"][key],
+            "added": added,
+            "removed": removed,
+            "changed": changed
+        })
+
+    for key, previous_fp in previous_fps["classes"].items():
+        if key in current_by_key:
+            continue
+        removed_class = {
+            "classKey": key,
+            "status": "removed",
+            "fingerprint": previous_fp
+        }
+        if previous_by_key is not None:
+            removed_class["classInfo"] = previous_by_key[key].get("classInfo")
+            removed_class["removed"] = previous_by_key[key].get("students", [])
+        changes.append(removed_class)
+
+    return {
+        "fingerprint": current_fps["document"],
+        "previousFingerprint": previous_fps["document"],
+        "unchanged": not changes,
+        "unchangedClasses": unchanged,
+        "classes": changes
+    }
+
+def process_anaokulu_pdf(reader, pdf_url=None, budget=None):
     """Anaokulu PDF'ini işler"""
     # Anaokulu bilgilerini ekle
     result = {
@@ -495,31 +785,38 @@ def process_anaokulu_pdf(reader, pdf_url=None):
     # PDF'deki gerçek öğrencileri okumaya çalış
     students_list = []
     
-    # Tüm içeriği önce tek bir metin olarak alalım
-    full_text = ""
+    # Sayfaları tek tek dolaş; tüm metni biriktirmek yerine satırları sayfa sayfa işle
+    budget = budget or JobBudget()
+    budget.check_pages(len(reader.pages))
+    file_path = reader.stream.name if hasattr(reader, 'stream') and hasattr(reader.stream, 'name') else pdf_url or ""
+    line_count = 0
+    student_data = []
     for page_num, page in enumerate(reader.pages):
         try:
-            text = extract_text_with_fallback(reader.stream.name if hasattr(reader, 'stream') and hasattr(reader.stream, 'name') else pdf_url or "", page_num, reader)
-            if text:
-                full_text += text
+            text = extract_text_with_fallback(file_path, page_num, reader, budget=budget)
+        except ResourceLimitError:
+            raise
         except Exception as e:
             logger.error(f"Sayfa {page_num + 1} metin çıkarma hatası: {str(e)}")
+            continue
+        if not text:
+            continue
+        budget.add_text(len(text), page_num)
+        budget.sample_rss(page_num)
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            line_count += 1
+            # Yüzde işareti ile başlayan satırları öğrenci numarası olarak kabul et
+            if line.startswith("%") and len(line) > 1:
+                student_id = line.replace("%", "").strip()
+                # Geçerli bir öğrenci numarası kontrolü
+                if any(c.isdigit() for c in student_id):
+                    student_data.append({"id": student_id})
     
-    # Tüm metni satırlara ayıralım
-    lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-    
-    # Debug amaçlı tüm satırları loglayalım
-    logger.info(f"PDF içeriğinde {len(lines)} satır bulundu")
-    
-    # PDF içeriğinde öğrenci bilgisi içeren satırları belirlemeye çalışalım
-    student_data = []
-    for line in lines:
-        # Yüzde işareti ile başlayan satırları öğrenci numarası olarak kabul et
-        if line.startswith("%") and len(line) > 1:
-            student_id = line.replace("%", "").strip()
-            # Geçerli bir öğrenci numarası kontrolü
-            if any(c.isdigit() for c in student_id):
-                student_data.append({"id": student_id})
+    # Debug amaçlı satır sayısını loglayalım
+    logger.info(f"PDF içeriğinde {line_count} satır bulundu")
     
     logger.info(f"Toplam {len(student_data)} öğrenci numarası bulundu")
     
@@ -538,11 +835,19 @@ def process_anaokulu_pdf(reader, pdf_url=None):
         }
     }
     
+    current_class["fingerprint"] = class_fingerprint(current_class)
     result["data"]["classes"].append(current_class)
+    result["data"]["fingerprints"] = document_fingerprints(result["data"]["classes"])
     return result
 
-def process_pdf(file_path, pdf_url=None):
+def process_pdf(file_path, pdf_url=None, diagnostics="full", lane=None, budget=None):
+    budget = budget or JobBudget()
     try:
+        if diagnostics not in DIAGNOSTICS_LEVELS:
+            raise ValueError(f"Geçersiz tanılama seviyesi: {diagnostics}")
+        collect_pages = diagnostics != "none"
+        collect_samples = diagnostics == "full"
+
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"PDF dosyası bulunamadı: {file_path}")
             
@@ -553,6 +858,7 @@ def process_pdf(file_path, pdf_url=None):
             raise ValueError("PDF dosyası boş!")
             
         logger.info(f"PDF toplam sayfa sayısı: {len(reader.pages)}")
+        budget.check_pages(len(reader.pages))
         
         # Varsayılan olarak is_anaokulu değişkenini başlat
         is_anaokulu = False
@@ -565,11 +871,14 @@ def process_pdf(file_path, pdf_url=None):
         # API üzerinden gelen geçici dosyalarda dosya adı kontrol edilemez
         # Bu durumda, dosya içeriğine bakalım
         try:
-            # Canlıda encoding farklılıklarında doğrudan OCR denesin (ilk sayfa)
-            first_page_text = extract_text_with_fallback(file_path, 0, reader, force_ocr=True).upper()
+            # Canlıda encoding farklılıklarında doğrudan OCR denesin (ilk sayfa);
+            # hızlı şeritte ilk sayfanın metin katmanı temiz olduğundan OCR atlanır
+            first_page_text = extract_text_with_fallback(file_path, 0, reader, force_ocr=(lane != FAST_LANE), budget=budget).upper()
             if "ANAOKULU" in first_page_text or "ANA OKULU" in first_page_text or "UMRANIYE" in first_page_text:
                 is_anaokulu = True
                 logger.info("PDF içeriğinde anaokulu/umraniye kelimesi tespit edildi")
+        except ResourceLimitError:
+            raise
         except Exception as e:
             logger.warning(f"PDF içeriği kontrol edilirken hata: {str(e)}")
         
@@ -585,16 +894,22 @@ def process_pdf(file_path, pdf_url=None):
                 "schoolInfo": None,
                 "classes": []
             },
-            "errors": [],
-            "diagnostics": {
-                "classHeaderCandidates": [],
-                "teacherLineCandidates": [],
+            "errors": []
+        }
+        if collect_pages:
+            result["diagnostics"] = {
+                "level": diagnostics,
+                "lane": lane,
                 "studentRegexHits": 0,
                 "studentRegexMisses": 0,
-                "studentRegexMissSamples": [],
                 "pages": []
             }
-        }
+            if collect_samples:
+                result["diagnostics"].update({
+                    "classHeaderCandidates": [],
+                    "teacherLineCandidates": [],
+                    "studentRegexMissSamples": []
+                })
 
         current_class = None
         students = []
@@ -606,27 +921,33 @@ def process_pdf(file_path, pdf_url=None):
             try:
                 logger.info(f"Sayfa {page_num + 1} işleniyor...")
                 # Önce normal metin, bozuksa OCR'a düşecek (garbled oranını kontrol ederek)
-                text = extract_text_with_fallback(file_path, page_num, reader)
+                text = extract_text_with_fallback(file_path, page_num, reader, budget=budget)
                 ocr_attempted = False
                 ocr_used = False
                 if not text or _looks_garbled(text) or _looks_fragmented(text):
                     logger.info(f"Sayfa {page_num + 1}: metin bozuk veya boş, OCR deneniyor")
                     ocr_attempted = True
-                    ocr_text = extract_text_with_fallback(file_path, page_num, reader, force_ocr=True)
+                    ocr_text = extract_text_with_fallback(file_path, page_num, reader, force_ocr=True, budget=budget)
                     if ocr_text and (not _looks_garbled(ocr_text)) and (not _looks_fragmented(ocr_text)):
                         text = ocr_text
                         ocr_used = True
                 
+                # Bütçe: toplam metin ve anlık bellek
+                if text:
+                    budget.add_text(len(text), page_num)
+                budget.sample_rss(page_num)
+
                 if not text:
                     logger.warning(f"Sayfa {page_num + 1}'den metin çıkarılamadı!")
-                    result["diagnostics"]["pages"].append({
-                        "page": page_num + 1,
-                        "lineCount": 0,
-                        "ocrAttempted": ocr_attempted,
-                        "ocrUsed": ocr_used,
-                        "foundClassHeader": False,
-                        "studentsAdded": 0
-                    })
+                    if collect_pages:
+                        result["diagnostics"]["pages"].append({
+                            "page": page_num + 1,
+                            "lineCount": 0,
+                            "ocrAttempted": ocr_attempted,
+                            "ocrUsed": ocr_used,
+                            "foundClassHeader": False,
+                            "studentsAdded": 0
+                        })
                     continue
                     
                 logger.debug(f"Sayfa {page_num + 1} metin içeriği:\n{text}")
@@ -642,19 +963,14 @@ def process_pdf(file_path, pdf_url=None):
                 
                 # Sınıf ve öğretmen bilgilerini topla (daha esnek)
                 for line in lines:
-                    # Tanılama: potansiyel başlık/öğretmen satırlarını topla
-                    if re.search(r"\bSınıf\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bŞubesi\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bListesi\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bAnaokulu\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bAnasınıfı\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bAna\s*Sınıfı\b", line, flags=re.IGNORECASE) or \
-                       re.search(r"\bÖğrenci\b", line, flags=re.IGNORECASE):
-                        if len(result["diagnostics"]["classHeaderCandidates"]) < 20:
-                            result["diagnostics"]["classHeaderCandidates"].append(line)
-                    if "Sınıf Öğretmeni:" in line:
-                        if len(result["diagnostics"]["teacherLineCandidates"]) < 20:
-                            result["diagnostics"]["teacherLineCandidates"].append(line)
+                    # Tanılama: potansiyel başlık/öğretmen satırlarını topla (yalnızca full seviyede)
+                    if collect_samples:
+                        header_candidates = result["diagnostics"]["classHeaderCandidates"]
+                        if len(header_candidates) < 20 and _CLASS_HEADER_CANDIDATE_RE.search(line):
+                            header_candidates.append(line)
+                        teacher_candidates = result["diagnostics"]["teacherLineCandidates"]
+                        if len(teacher_candidates) < 20 and "Sınıf Öğretmeni:" in line:
+                            teacher_candidates.append(line)
 
                     # 1) Her satırı potansiyel sınıf başlığı olarak dene
                     class_info_candidate = extract_class_info(line)
@@ -682,24 +998,29 @@ def process_pdf(file_path, pdf_url=None):
                     student = extract_student_info(line)
                     if student:
                         students.append(student)
-                        result["diagnostics"]["studentRegexHits"] += 1
                         page_students_added += 1
-                    else:
-                        # Olası öğrenci satırını ama regex kaçırmışsa örnekle
-                        if (("Kız" in line or "Erkek" in line) or re.search(r"\b\d{1,4}\b", line)) and len(result["diagnostics"]["studentRegexMissSamples"]) < 25:
-                            result["diagnostics"]["studentRegexMissSamples"].append(line)
+                        if collect_pages:
+                            result["diagnostics"]["studentRegexHits"] += 1
+                    elif collect_pages:
+                        # Olası öğrenci satırını regex kaçırmışsa say; örnekleri yalnızca full seviyede tut
+                        if ("Kız" in line or "Erkek" in line) or _STUDENT_MISS_CANDIDATE_RE.search(line):
                             result["diagnostics"]["studentRegexMisses"] += 1
+                            if collect_samples and len(result["diagnostics"]["studentRegexMissSamples"]) < 25:
+                                result["diagnostics"]["studentRegexMissSamples"].append(line)
                         
                 # Sayfa tanılama özeti
-                result["diagnostics"]["pages"].append({
-                    "page": page_num + 1,
-                    "lineCount": len(lines),
-                    "ocrAttempted": ocr_attempted,
-                    "ocrUsed": ocr_used,
-                    "foundClassHeader": found_class_header_this_page,
-                    "studentsAdded": page_students_added
-                })
+                if collect_pages:
+                    result["diagnostics"]["pages"].append({
+                        "page": page_num + 1,
+                        "lineCount": len(lines),
+                        "ocrAttempted": ocr_attempted,
+                        "ocrUsed": ocr_used,
+                        "foundClassHeader": found_class_header_this_page,
+                        "studentsAdded": page_students_added
+                    })
 
+            except ResourceLimitError:
+                raise
             except Exception as e:
                 logger.error(f"Sayfa {page_num + 1} işlenirken hata: {str(e)}")
                 result["errors"].append({
@@ -710,6 +1031,7 @@ def process_pdf(file_path, pdf_url=None):
 
         # Son sınıfı ekle
         save_current_class(current_class, students, result)
+        result["data"]["fingerprints"] = document_fingerprints(result["data"]["classes"])
         
         # Sonuçları kontrol et
         if not result["data"]["schoolInfo"]:
@@ -720,13 +1042,14 @@ def process_pdf(file_path, pdf_url=None):
         if not result["data"]["classes"]:
             logger.error("Hiç sınıf bilgisi bulunamadı!")
             result["success"] = False
-            # Daha açıklayıcı mesaj hazırla
+            # Daha açıklayıcı mesaj hazırla (toplanan tanılama verisi kadar)
             reason_parts = []
-            if not result["diagnostics"]["classHeaderCandidates"]:
+            diag = result.get("diagnostics", {})
+            if collect_samples and not diag["classHeaderCandidates"]:
                 reason_parts.append("sınıf başlığına benzer satır bulunamadı")
-            if result["diagnostics"]["studentRegexHits"] == 0 and result["diagnostics"]["studentRegexMisses"] > 0:
+            if collect_pages and diag["studentRegexHits"] == 0 and diag["studentRegexMisses"] > 0:
                 reason_parts.append("öğrenci satırları mevcut ancak regex ile eşleşmedi")
-            if all(p.get("ocrAttempted") and not p.get("ocrUsed") for p in result["diagnostics"]["pages"]) and any(p.get("ocrAttempted") for p in result["diagnostics"]["pages"]):
+            if collect_pages and all(p.get("ocrAttempted") and not p.get("ocrUsed") for p in diag["pages"]) and any(p.get("ocrAttempted") for p in diag["pages"]):
                 reason_parts.append("OCR denendi ancak kullanılabilir metin üretilemedi")
             if not reason_parts:
                 reason_parts.append("beklenen başlık/satır formatı tespit edilemedi")
@@ -734,11 +1057,35 @@ def process_pdf(file_path, pdf_url=None):
 
         # Tanılama verilerini data içine da yansıt
         result["data"]["errors"] = result.get("errors", [])
-        result["data"]["diagnostics"] = result.get("diagnostics", {})
+        if collect_pages:
+            result["diagnostics"]["textChars"] = budget.text_chars
+            result["diagnostics"].update(budget.memory_diagnostics())
+            result["data"]["diagnostics"] = result["diagnostics"]
 
         logger.info("PDF işleme tamamlandı")
         return result
 
+    except ResourceLimitError as e:
+        logger.error(f"PDF kaynak sınırını aştı ({e.limit}): {str(e)}")
+        errors = [{
+            "page": e.page,
+            "type": "ResourceLimitError",
+            "limit": e.limit,
+            "message": str(e)
+        }]
+        # API yalnızca data bloğunu döndürdüğünden hata ve tanılama verilerini data içine de yansıt
+        result = {
+            "success": False,
+            "message": f"PDF kaynak sınırını aştı: {str(e)}",
+            "data": {"errors": errors},
+            "errors": errors
+        }
+        if diagnostics != "none":
+            limit_diagnostics = {"limit": e.limit, "textChars": budget.text_chars}
+            limit_diagnostics.update(budget.memory_diagnostics())
+            result["data"]["diagnostics"] = limit_diagnostics
+            result["diagnostics"] = limit_diagnostics
+        return result
     except Exception as e:
         logger.error(f"PDF işlenirken hata oluştu: {str(e)}")
         return {
@@ -750,4 +1097,30 @@ def process_pdf(file_path, pdf_url=None):
                 "type": "FileProcessError",
                 "message": str(e)
             }]
-        } 
\ No newline at end of file
+        } 
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="E-Okul öğrenci listesi PDF'ini JSON'a dönüştürür")
+    parser.add_argument("file", help="PDF dosya yolu")
+    parser.add_argument("--url", default=None, help="Kaynak URL (anaokulu tespiti için)")
+    parser.add_argument("--diagnostics", choices=DIAGNOSTICS_LEVELS, default="full")
+    parser.add_argument("--profile", metavar="FOLDED_FILE", default=None,
+                        help="İşlemi örnekleyerek profille ve folded yığınları bu dosyaya yaz")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.profile:
+        from profiling import SamplingProfiler
+
+        with SamplingProfiler() as profiler:
+            output = process_pdf(args.file, args.url, diagnostics=args.diagnostics)
+        with open(args.profile, "w") as f:
+            f.write(profiler.folded() + "\n")
+        for row in profiler.function_breakdown():
+            logger.info(f"{row['function']}: {row['inclusiveMs']} ms ({row['inclusivePct']}%), self {row['selfMs']} ms")
+        logger.info(f"Profil yazıldı: {args.profile}")
+    else:
+        output = process_pdf(args.file, args.url, diagnostics=args.diagnostics)
+    print(json.dumps(output, ensure_ascii=False, indent=2))
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+import uuid
+
+# Örnekleme aralığı (sn)
+DEFAULT_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+
+class SamplingProfiler:
+    """Tek bir iş parçacığını periyodik örnekleyen hafif profil çıkarıcı.
+
+    Yığınları flamegraph.pl / speedscope ile uyumlu "folded" biçimde toplar.
+    Yalnızca `with` bloğu içinde çalışır; kullanılmadığında ek maliyeti yoktur."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = {}
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._sampler = None
+        self._start = None
+
+    def __enter__(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._sampler.join()
+        self.elapsed = time.perf_counter() - self._start
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def folded(self):
+        """flamegraph.pl / speedscope için "a;b;c sayı" satırları"""
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items()))
+
+    def function_breakdown(self, filename="pdf_reader.py"):
+        """Verilen dosyadaki fonksiyonlar için kapsayıcı (inclusive) ve kendi (self) süreleri"""
+        prefix = f"{filename}:"
+        inclusive = {}
+        own = {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            # Özyinelemede aynı fonksiyon bir kez sayılır
+            for name in set(frames):
+                if name.startswith(prefix):
+                    inclusive[name] = inclusive.get(name, 0) + count
+            if frames[-1].startswith(prefix):
+                own[frames[-1]] = own.get(frames[-1], 0) + count
+        per_sample_ms = self.elapsed * 1000 / max(self.samples, 1)
+        return [
+            {
+                "function": name[len(prefix):],
+                "samples": count,
+                "inclusiveMs": round(count * per_sample_ms, 1),
+                "selfMs": round(own.get(name, 0) * per_sample_ms, 1),
+                "inclusivePct": round(100 * count / max(self.samples, 1), 1)
+            }
+            for name, count in sorted(inclusive.items(), key=lambda item: item[1], reverse=True)
+        ]
+
+    def summary(self):
+        """Yanıta eklenecek profil özeti"""
+        return {
+            "intervalMs": round(self.interval * 1000, 3),
+            "elapsedMs": round(self.elapsed * 1000, 1),
+            "samples": self.samples,
+            "functions": self.function_breakdown(),
+            "folded": self.folded()
+        }
+
+    def save(self, directory):
+        """Folded profili dizine yazar ve dosya yolunu döndürür"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.folded")
+        with open(path, "w") as f:
+            f.write(self.folded() + "\n")
+        return path
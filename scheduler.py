@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_reader import FAST_LANE, OCR_LANE
+
+logger = logging.getLogger(__name__)
+
+# Şerit sayaçları her uvicorn işçisinde ayrı tutulur; işçiler anlık görüntülerini
+# bu dizine <pid>.json olarak yazar, /metrics hepsini toplar. Dizin örneğe özel olmalıdır
+# (aynı makinedeki başka bir örnekle paylaşılırsa sayaçları karışır); tanımlı değilse
+# /metrics yalnızca isteği karşılayan işçinin sayaçlarını döndürür
+METRICS_DIR = os.getenv("LANE_METRICS_DIR", "")
+
+# Toplanırken işçiler arasında toplanan sayaçlar
+_SUMMED_STATS = ("concurrency", "queueSize", "queued", "active", "completed", "failed", "rejected", "timeouts", "totalSeconds")
+
+
+class LaneBusyError(Exception):
+    """Şerit kuyruğu dolu olduğunda fırlatılır"""
+
+
+class LaneTimeoutError(Exception):
+    """Şerit zaman aşımında fırlatılır; started işin başlayıp başlamadığını belirtir"""
+
+    def __init__(self, message, started):
+        super().__init__(message)
+        self.started = started
+
+
+class Lane:
+    """Kendi eşzamanlılık sınırı, bekleme kuyruğu ve zaman aşımı olan işçi havuzu"""
+
+    def __init__(self, name, concurrency, queue_size, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"lane-{name}")
+        self._slots = None
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+
+    def _get_slots(self):
+        # Semafor, çalışan event loop içinde ilk kullanımda oluşturulur
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    async def run(self, func, *args):
+        """func'ı şeridin havuzunda çalıştırır; kuyruk doluysa LaneBusyError,
+        süre aşılırsa LaneTimeoutError fırlatır"""
+        try:
+            return await self._run(func, *args)
+        finally:
+            publish_metrics()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+        start = time.monotonic()
+        if slots.locked():
+            # Tüm slotlar doluysa kuyruğa gir; kuyruk da doluysa reddet
+            if self.queued >= self.queue_size:
+                self.rejected += 1
+                raise LaneBusyError(f"{self.name} şeridi dolu ({self.queue_size} iş bekliyor)")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LaneTimeoutError(f"{self.name} şeridinde sıra beklerken zaman aşımı", started=False)
+            finally:
+                self.queued -= 1
+        else:
+            await slots.acquire()
+
+        self.active += 1
+        future = loop.run_in_executor(self._executor, func, *args)
+        publish_metrics()
+
+        def _release(_):
+            # İş zaman aşımından sonra bitse bile slot ancak iş bitince boşalır
+            self.active -= 1
+            slots.release()
+            publish_metrics()
+
+        future.add_done_callback(_release)
+        remaining = max(self.timeout - (time.monotonic() - start), 0)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LaneTimeoutError(f"{self.name} şeridinde işlem zaman aşımına uğradı", started=True)
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        self.total_seconds += time.monotonic() - start
+        return result
+
+    def stats(self):
+        """Şerit metrikleri"""
+        return {
+            "concurrency": self.concurrency,
+            "queueSize": self.queue_size,
+            "timeout": self.timeout,
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "totalSeconds": round(self.total_seconds, 3),
+            "avgSeconds": round(self.total_seconds / self.completed, 3) if self.completed else None
+        }
+
+
+def _lane_from_env(name, concurrency, queue_size, timeout):
+    prefix = f"{name.upper()}_LANE"
+    return Lane(
+        name,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        queue_size=int(os.getenv(f"{prefix}_QUEUE", str(queue_size))),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+    )
+
+
+# Hızlı şerit: metin katmanı temiz belgeler; OCR şeridi: taranmış/bozuk belgeler
+LANES = {
+    FAST_LANE: _lane_from_env(FAST_LANE, concurrency=4, queue_size=32, timeout=30),
+    OCR_LANE: _lane_from_env(OCR_LANE, concurrency=1, queue_size=8, timeout=300),
+}
+
+
+def publish_metrics():
+    """Bu işçinin şerit sayaçlarını paylaşılan metrik dizinine atomik olarak yazar"""
+    if not METRICS_DIR:
+        return
+    snapshot = {
+        "pid": os.getpid(),
+        "updatedAt": time.time(),
+        "lanes": {name: lane.stats() for name, lane in LANES.items()}
+    }
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.debug(f"Şerit metrikleri yazılamadı: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_metrics():
+    """Tüm canlı işçilerin şerit sayaçlarını toplar; ölü işçilerin dosyalarını siler.
+    LANE_METRICS_DIR tanımlı değilse yalnızca bu işçinin sayaçlarını döndürür"""
+    if not METRICS_DIR:
+        lanes = {name: lane.stats() for name, lane in LANES.items()}
+        return {
+            "pid": os.getpid(),
+            "scope": "worker",
+            "workerCount": 1,
+            "lanes": lanes,
+            "workers": {str(os.getpid()): lanes}
+        }
+    publish_metrics()
+    workers = {}
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            pid = int(name[:-len(".json")])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                workers[pid] = json.load(f)["lanes"]
+        except (OSError, ValueError, KeyError):
+            continue
+
+    totals = {}
+    for lanes in workers.values():
+        for lane_name, stats in lanes.items():
+            total = totals.setdefault(lane_name, {key: 0 for key in _SUMMED_STATS})
+            for key in _SUMMED_STATS:
+                total[key] += stats.get(key) or 0
+    for total in totals.values():
+        total["totalSeconds"] = round(total["totalSeconds"], 3)
+        total["avgSeconds"] = round(total["totalSeconds"] / total["completed"], 3) if total["completed"] else None
+
+    return {
+        "pid": os.getpid(),
+        "scope": "all-workers",
+        "workerCount": len(workers),
+        "lanes": totals,
+        "workers": {str(pid): lanes for pid, lanes in sorted(workers.items())}
+    }
@@ -0,0 +1,21 @@
+import fitz
+import pytest
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Verilen sayfa metinlerinden PyMuPDF ile geçici bir PDF üretir."""
+    def _make_pdf(pages, name="sample.pdf", fontsize=11, fontfile=None):
+        path = tmp_path / name
+        doc = fitz.open()
+        for text in pages:
+            page = doc.new_page()
+            if fontfile:
+                page.insert_font(fontname="embedded", fontfile=fontfile)
+                page.insert_text((72, 72), text, fontsize=fontsize, fontname="embedded")
+            else:
+                page.insert_text((72, 72), text, fontsize=fontsize)
+        doc.save(str(path))
+        doc.close()
+        return str(path)
+    return _make_pdf
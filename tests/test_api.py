@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+client = TestClient(api.app)
+
+
+@pytest.fixture
+def no_download(monkeypatch):
+    """İndirme denenirse testi düşürür"""
+    async def fail_download(pdf_url):
+        raise AssertionError("doğrulanmamış istek için indirme yapıldı")
+    monkeypatch.setattr(api, "_download_pdf", fail_download)
+
+
+@pytest.mark.parametrize("previous", [
+    {"classes": "x"},
+    {"classes": [5]},
+    {"classes": [{"students": [{"name": "Ali"}]}]},
+    {"document": "abc"},
+    {"data": {"classes": "x"}},
+])
+def test_diff_rejects_malformed_previous(no_download, previous):
+    response = client.post("/process-pdf/diff", json={"pdf_url": "http://example.com/a.pdf", "previous": previous})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("previous", [
+    {"document": "abc", "classes": {"9|A|FTL": "fp"}},
+    {"classes": [{"classInfo": {"grade": "9"}, "students": [{"studentId": "1", "name": "Ali"}]}]},
+    {"status": True, "message": "ok", "data": {"classes": []}},
+])
+def test_diff_accepts_both_previous_shapes(monkeypatch, tmp_path, previous):
+    received = {}
+
+    async def fake_download(pdf_url):
+        return str(tmp_path / "a.pdf")
+
+    async def fake_process(temp_path, source, diagnostics="full", previous=None, profile=False):
+        received["previous"] = previous
+        return api.APIResponse(status=True, message="ok", data={})
+
+    monkeypatch.setattr(api, "_download_pdf", fake_download)
+    monkeypatch.setattr(api, "_process_temp_pdf", fake_process)
+    response = client.post("/process-pdf/diff", json={"pdf_url": "http://example.com/a.pdf", "previous": previous})
+
+    assert response.status_code == 200
+    assert isinstance(received["previous"], dict)
+    assert received["previous"].get("classes", received["previous"].get("data", {}).get("classes")) is not None
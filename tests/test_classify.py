@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import pdf_reader
+from pdf_reader import FAST_LANE, OCR_LANE, classify_pdf
+
+DEJAVU_SANS = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+ROSTER_TEXT = "FTL - 9. Sınıf / A Şubesi\n1 1234 Ahmet Yılmaz Erkek\n2 1235 Ayşe Demir Kız"
+
+
+def test_clean_text_goes_to_fast_lane(make_pdf):
+    assert classify_pdf(make_pdf([ROSTER_TEXT])) == FAST_LANE
+
+
+def test_blank_page_goes_to_ocr_lane(make_pdf):
+    assert classify_pdf(make_pdf([""])) == OCR_LANE
+
+
+def test_falls_back_when_pypdf2_fails(make_pdf, monkeypatch):
+    path = make_pdf([ROSTER_TEXT])
+    monkeypatch.setattr(pdf_reader, "_extract_pypdf2", lambda reader, page_index: None)
+
+    assert classify_pdf(path) == FAST_LANE
+
+
+@pytest.mark.skipif(not os.path.exists(DEJAVU_SANS), reason="DejaVu Sans yüklü değil")
+def test_embedded_font_unreadable_by_pypdf2_stays_fast(make_pdf):
+    # PyPDF2 3.0.1 bu fontun ToUnicode eşlemesinde "Odd-length string" hatası verir
+    path = make_pdf([ROSTER_TEXT], fontfile=DEJAVU_SANS)
+
+    assert pdf_reader._extract_pypdf2(pdf_reader.PdfReader(path), 0) is None
+    assert classify_pdf(path) == FAST_LANE
@@ -0,0 +1,24 @@
+import pytest
+
+from pdf_reader import FAST_LANE, process_pdf
+
+
+@pytest.fixture
+def miss_heavy_pdf(make_pdf):
+    # Öğrenci regex'ine uymayan ama rakam içeren 30 satır
+    return make_pdf(["\n".join(f"{i} satir" for i in range(1, 31))], name="misses.pdf", fontsize=8)
+
+
+def test_miss_counter_matches_across_levels(miss_heavy_pdf):
+    full = process_pdf(miss_heavy_pdf, diagnostics="full", lane=FAST_LANE)["diagnostics"]
+    summary = process_pdf(miss_heavy_pdf, diagnostics="summary", lane=FAST_LANE)["diagnostics"]
+
+    assert full["studentRegexMisses"] == summary["studentRegexMisses"] == 30
+    assert len(full["studentRegexMissSamples"]) == 25
+    assert "studentRegexMissSamples" not in summary
+
+
+def test_none_level_omits_diagnostics(miss_heavy_pdf):
+    result = process_pdf(miss_heavy_pdf, diagnostics="none", lane=FAST_LANE)
+    assert "diagnostics" not in result
+    assert "diagnostics" not in result["data"]
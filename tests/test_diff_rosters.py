@@ -0,0 +1,125 @@
+from pdf_reader import (
+    class_fingerprint,
+    diff_rosters,
+    document_fingerprints,
+    save_current_class,
+)
+
+
+def student(student_id, name="ALİ", surname="YILMAZ", gender="male", order_no=1):
+    return {
+        "orderNo": order_no,
+        "studentId": student_id,
+        "name": name,
+        "surname": surname,
+        "gender": gender,
+    }
+
+
+def klass(grade, students, section="A", class_type="FEN BİLİMLERİ"):
+    entry = {
+        "classInfo": {"grade": grade, "section": section, "type": class_type, "teachers": []},
+        "students": students,
+    }
+    entry["fingerprint"] = class_fingerprint(entry)
+    return entry
+
+
+def by_key(diff):
+    return {c["classKey"]: c for c in diff["classes"]}
+
+
+def test_unchanged_roster():
+    classes = [klass("9", [student("1"), student("2")])]
+    diff = diff_rosters({"classes": classes}, classes)
+    assert diff["unchanged"] is True
+    assert diff["classes"] == []
+    assert diff["unchangedClasses"] == 1
+    assert diff["fingerprint"] == diff["previousFingerprint"]
+
+
+def test_added_removed_and_changed_students():
+    previous = [klass("9", [student("1"), student("2"), student("3", surname="KAYA")])]
+    current = [klass("9", [student("1"), student("3", surname="DEMİR"), student("4")])]
+
+    diff = diff_rosters({"classes": previous}, current)
+
+    change = by_key(diff)["9|A|FEN BİLİMLERİ"]
+    assert change["status"] == "changed"
+    assert [s["studentId"] for s in change["added"]] == ["4"]
+    assert [s["studentId"] for s in change["removed"]] == ["2"]
+    assert [c["studentId"] for c in change["changed"]] == ["3"]
+    assert change["changed"][0]["before"]["surname"] == "KAYA"
+    assert change["changed"][0]["after"]["surname"] == "DEMİR"
+
+
+def test_order_number_shift_is_not_a_change():
+    previous = [klass("9", [student("1", order_no=1), student("2", order_no=2)])]
+    current = [klass("9", [student("2", order_no=1), student("1", order_no=2)])]
+    assert diff_rosters({"classes": previous}, current)["unchanged"] is True
+
+
+def test_added_and_removed_classes():
+    previous = [klass("9", [student("1")]), klass("10", [student("5")])]
+    current = [klass("9", [student("1")]), klass("11", [student("7")])]
+
+    changes = by_key(diff_rosters({"classes": previous}, current))
+
+    assert changes["11|A|FEN BİLİMLERİ"]["status"] == "added"
+    assert [s["studentId"] for s in changes["11|A|FEN BİLİMLERİ"]["added"]] == ["7"]
+    assert changes["10|A|FEN BİLİMLERİ"]["status"] == "removed"
+    assert [s["studentId"] for s in changes["10|A|FEN BİLİMLERİ"]["removed"]] == ["5"]
+    assert "9|A|FEN BİLİMLERİ" not in changes
+
+
+def test_fingerprint_only_previous():
+    previous = [klass("9", [student("1"), student("2")]), klass("10", [student("5")])]
+    current = [klass("9", [student("1"), student("3")]), klass("10", [student("5")])]
+
+    diff = diff_rosters(document_fingerprints(previous), current)
+
+    changes = by_key(diff)
+    assert diff["unchangedClasses"] == 1
+    assert changes["9|A|FEN BİLİMLERİ"]["status"] == "changed"
+    # Öğrenci verisi olmadığından güncel liste döner
+    assert [s["studentId"] for s in changes["9|A|FEN BİLİMLERİ"]["students"]] == ["1", "3"]
+    assert "10|A|FEN BİLİMLERİ" not in changes
+
+
+def test_fingerprint_only_previous_unchanged():
+    classes = [klass("9", [student("1")])]
+    diff = diff_rosters(document_fingerprints(classes), classes)
+    assert diff["unchanged"] is True
+
+
+def test_duplicate_class_key_chunks_are_grouped():
+    # Başlığı ikinci sayfada tekrarlanan sınıf: aynı anahtar iki parça
+    previous = [klass("9", [student("1", surname="KAYA")]), klass("9", [student("2")])]
+    current = [klass("9", [student("1", surname="DEMİR")]), klass("9", [student("2")])]
+
+    fingerprints = document_fingerprints(current)
+    merged = klass("9", [student("1"), student("2")])
+    assert fingerprints["classes"]["9|A|FEN BİLİMLERİ"] == class_fingerprint(merged)
+
+    diff = diff_rosters({"classes": previous}, current)
+    assert diff["unchanged"] is False
+    change = by_key(diff)["9|A|FEN BİLİMLERİ"]
+    assert [c["studentId"] for c in change["changed"]] == ["1"]
+    assert change["added"] == [] and change["removed"] == []
+
+
+def test_save_current_class_merges_repeated_header():
+    result = {"data": {"classes": []}}
+    info = {"grade": "9", "section": "A", "type": "FEN BİLİMLERİ", "teachers": []}
+
+    save_current_class({"classInfo": dict(info)}, [student("1", gender="female")], result)
+    save_current_class({"classInfo": dict(info, teachers=[{"name": "AYŞE", "role": "Sınıf Öğretmeni"}])},
+                       [student("2")], result)
+
+    classes = result["data"]["classes"]
+    assert len(classes) == 1
+    assert [s["studentId"] for s in classes[0]["students"]] == ["1", "2"]
+    assert classes[0]["statistics"]["totalStudents"] == 2
+    assert classes[0]["statistics"]["genderDistribution"] == {"female": 1, "male": 1}
+    assert classes[0]["classInfo"]["teachers"] == [{"name": "AYŞE", "role": "Sınıf Öğretmeni"}]
+    assert classes[0]["fingerprint"] == class_fingerprint(classes[0])
@@ -0,0 +1,69 @@
+import pytest
+
+import api
+import pdf_reader
+from pdf_reader import FAST_LANE, JobBudget, process_pdf
+
+
+@pytest.fixture
+def sample_pdf(make_pdf):
+    return make_pdf([f"Page {page_no + 1} " + "x" * 40 for page_no in range(3)])
+
+
+def test_page_limit_is_reported_under_data(sample_pdf):
+    result = process_pdf(sample_pdf, lane=FAST_LANE, budget=JobBudget(max_pages=2))
+
+    assert result["success"] is False
+    error = result["data"]["errors"][0]
+    assert error["type"] == "ResourceLimitError"
+    assert error["limit"] == "pages"
+    assert result["data"]["diagnostics"]["limit"] == "pages"
+    assert "peakRssGrowthMb" in result["data"]["diagnostics"]
+    assert "processPeakRssMb" in result["data"]["diagnostics"]
+
+
+def test_text_limit_names_the_page(sample_pdf):
+    result = process_pdf(sample_pdf, lane=FAST_LANE, budget=JobBudget(max_text_chars=10))
+
+    error = result["data"]["errors"][0]
+    assert error["limit"] == "text"
+    assert error["page"] == 1
+    assert result["data"]["diagnostics"]["textChars"] > 10
+
+
+def test_memory_diagnostics_on_normal_run(sample_pdf):
+    result = process_pdf(sample_pdf, diagnostics="summary", lane=FAST_LANE)
+
+    diagnostics = result["data"]["diagnostics"]
+    assert diagnostics["peakRssGrowthMb"] >= 0
+    assert diagnostics["processPeakRssMb"] >= diagnostics["peakRssGrowthMb"]
+    assert diagnostics["textChars"] > 0
+
+
+def test_none_level_omits_diagnostics_on_limit(sample_pdf):
+    result = process_pdf(sample_pdf, diagnostics="none", lane=FAST_LANE, budget=JobBudget(max_pages=2))
+
+    assert result["data"]["errors"][0]["limit"] == "pages"
+    assert "diagnostics" not in result
+    assert "diagnostics" not in result["data"]
+
+
+def test_rss_limit_is_enforced_by_budget(sample_pdf, monkeypatch):
+    budget = JobBudget(max_rss_mb=1)
+    monkeypatch.setattr(pdf_reader, "_current_rss_bytes", lambda: budget.start_rss + 2 * 1024 * 1024)
+    result = process_pdf(sample_pdf, lane=FAST_LANE, budget=budget)
+
+    assert result["data"]["errors"][0]["limit"] == "rss"
+
+
+def test_api_jobs_only_report_rss_growth(sample_pdf, monkeypatch):
+    budgets = []
+
+    def fake_process_pdf(file_path, pdf_url=None, diagnostics="full", lane=None, budget=None):
+        budgets.append(budget)
+        return {"success": True, "data": {}}
+
+    monkeypatch.setattr(api, "process_pdf", fake_process_pdf)
+    api._run_pdf_job(sample_pdf, None, "full", FAST_LANE)
+
+    assert budgets[0].max_rss_mb == 0
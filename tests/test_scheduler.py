@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+import scheduler
+from scheduler import Lane, LaneBusyError, LaneTimeoutError
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    # Testler paylaşılan metrik dizinine yazmasın
+    monkeypatch.setattr(scheduler, "METRICS_DIR", str(tmp_path))
+
+
+def blocking_job(release):
+    """release olayı gelene kadar havuz iş parçacığını meşgul eder"""
+    release.wait(5)
+    return "done"
+
+
+async def wait_until(predicate, timeout=2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_size=1, timeout=5)
+        release = threading.Event()
+        running = asyncio.create_task(lane.run(blocking_job, release))
+        await wait_until(lambda: lane.active == 1)
+        waiting = asyncio.create_task(lane.run(blocking_job, release))
+        await wait_until(lambda: lane.queued == 1)
+
+        with pytest.raises(LaneBusyError):
+            await lane.run(blocking_job, release)
+
+        release.set()
+        assert await asyncio.gather(running, waiting) == ["done", "done"]
+        assert lane.rejected == 1
+        assert lane.completed == 2
+
+    asyncio.run(scenario())
+
+
+def test_timeout_reports_whether_the_job_started():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_size=4, timeout=0.2)
+        release = threading.Event()
+        running = asyncio.create_task(lane.run(blocking_job, release))
+        await wait_until(lambda: lane.active == 1)
+        waiting = asyncio.create_task(lane.run(blocking_job, release))
+
+        results = await asyncio.gather(running, waiting, return_exceptions=True)
+        release.set()
+        await wait_until(lambda: lane.active == 0)
+
+        assert all(isinstance(r, LaneTimeoutError) for r in results)
+        assert results[0].started is True
+        assert results[1].started is False
+        assert lane.timeouts == 2
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_held_until_timed_out_job_finishes():
+    async def scenario():
+        lane = Lane("test", concurrency=1, queue_size=4, timeout=0.1)
+        release = threading.Event()
+
+        with pytest.raises(LaneTimeoutError):
+            await lane.run(blocking_job, release)
+
+        # İş arka planda sürdüğü için slot hâlâ dolu
+        assert lane.active == 1
+        assert lane._get_slots().locked()
+
+        release.set()
+        await wait_until(lambda: lane.active == 0)
+        assert not lane._get_slots().locked()
+        assert await lane.run(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_metrics_are_per_worker_without_metrics_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, "METRICS_DIR", "")
+    metrics = scheduler.collect_metrics()
+
+    assert metrics["scope"] == "worker"
+    assert metrics["workerCount"] == 1
+    assert set(metrics["lanes"]) == set(scheduler.LANES)
+
+
+def test_metrics_are_summed_from_metrics_dir(tmp_path):
+    scheduler.publish_metrics()
+    metrics = scheduler.collect_metrics()
+
+    assert metrics["scope"] == "all-workers"
+    assert metrics["workerCount"] == 1
+    assert list(tmp_path.iterdir()) == [tmp_path / f"{metrics['pid']}.json"]
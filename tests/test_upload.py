@@ -0,0 +1,113 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+client = TestClient(api.app)
+
+BOUNDARY = "testboundary"
+PDF_BYTES = b"%PDF-1.4\n" + b"x" * 200
+
+
+def part(name, value, filename=None):
+    disposition = f'form-data; name="{name}"'
+    if filename:
+        disposition += f'; filename="{filename}"'
+    return f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+
+
+def body(*parts, closed=True):
+    return b"".join(parts) + (f"--{BOUNDARY}--\r\n".encode() if closed else b"")
+
+
+def post(content, headers=None):
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}", **(headers or {})}
+    return client.post("/process-pdf/upload", content=content, headers=headers)
+
+
+def chunked(data, size=64):
+    # Content-Length olmadan (chunked) gönderim
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """_process_temp_pdf yerine yüklenen dosyayı ve alanları kaydeder"""
+    calls = []
+
+    async def fake_process(temp_path, source, diagnostics="full", previous=None, profile=False):
+        with open(temp_path, "rb") as f:
+            calls.append({"content": f.read(), "source": source, "diagnostics": diagnostics, "profile": profile})
+        return api.APIResponse(status=True, message="ok", data={})
+
+    monkeypatch.setattr(api, "_process_temp_pdf", fake_process)
+    return calls
+
+
+def test_upload_streams_file_to_processing(processed):
+    response = post(body(part("file", PDF_BYTES, "a.pdf"), part("diagnostics", b"summary")))
+
+    assert response.status_code == 200
+    assert processed == [{"content": PDF_BYTES, "source": "a.pdf", "diagnostics": "summary", "profile": False}]
+
+
+def test_rejects_non_multipart(processed):
+    response = client.post("/process-pdf/upload", content=PDF_BYTES, headers={"Content-Type": "application/pdf"})
+    assert response.status_code == 415
+
+
+def test_rejects_declared_length_before_reading(processed, monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_BYTES", 100)
+    response = post(body(part("file", PDF_BYTES, "a.pdf")))
+
+    assert response.status_code == 413
+    assert processed == []
+
+
+def test_rejects_oversized_file_mid_stream(processed, monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_BYTES", 100)
+    response = post(chunked(body(part("file", PDF_BYTES, "a.pdf"))))
+
+    assert response.status_code == 413
+    assert processed == []
+
+
+def test_rejects_oversized_body_mid_stream(processed, monkeypatch):
+    # Gövde sınırı dosya parçasından bağımsız olarak da uygulanır
+    monkeypatch.setattr(api, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(api, "UPLOAD_FORM_OVERHEAD_BYTES", 0)
+    padding = b"".join(part(f"extra{i}", b"y" * 100) for i in range(20))
+    response = post(chunked(body(padding, part("file", PDF_BYTES, "a.pdf"))))
+
+    assert response.status_code == 413
+    assert processed == []
+
+
+def test_rejects_oversized_form_field(processed):
+    response = post(body(part("file", PDF_BYTES, "a.pdf"), part("diagnostics", b"x" * 2000)))
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("content, detail", [
+    (body(part("diagnostics", b"full")), "file alanı eksik"),
+    (body(part("file", b"", "a.pdf")), "PDF dosyası boş"),
+    (body(part("file", PDF_BYTES, "a.pdf"), closed=False), "Multipart gövdesi eksik"),
+    (body(part("file", PDF_BYTES, "a.pdf"), part("file", PDF_BYTES, "b.pdf")), "Birden fazla file alanı gönderildi"),
+    (b"garbage without boundary", None),
+])
+def test_rejects_bad_bodies_with_400(processed, content, detail):
+    response = post(content)
+
+    assert response.status_code == 400
+    if detail:
+        assert response.json()["detail"] == detail
+    assert processed == []
+
+
+@pytest.mark.parametrize("field, value", [("diagnostics", b"verbose"), ("profile", b"maybe")])
+def test_rejects_invalid_form_fields(processed, field, value):
+    response = post(body(part("file", PDF_BYTES, "a.pdf"), part(field, value)))
+
+    assert response.status_code == 422
+    assert processed == []